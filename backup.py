@@ -1,184 +1,108 @@
-import json
+import base64
+import contextlib
+import gzip
+import hashlib
+import jinja2
 import os
+import queue
+import re
+import orjson
 import requests
-from datetime import datetime
-from typing import List, Dict, Any
-from pymongo import MongoClient
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+import zstandard
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from bson import DBRef, Decimal128, MaxKey, MinKey, ObjectId, Regex, Timestamp, json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import CursorType, MongoClient
+from pymongo.cursor import Cursor
 from pymongo.errors import PyMongoError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from google.api_core.exceptions import PreconditionFailed
 from google.cloud import storage
+from google.resumable_media import InvalidResponse
+import atexit
 import logging
+import logging.handlers
+
+try:
+    # ISA-L's SIMD deflate writes the same gzip format several times faster than zlib
+    from isal import igzip
+except ImportError:
+    igzip = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class MongoDBBackup:
-    def __init__(self):
-        self.mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
-        self.gcs_bucket = os.getenv('GCS_BUCKET')
-        self.gcs_project = os.getenv('GCP_PROJECT_ID')
-        self.db_name = os.getenv('MONGO_DB_NAME', 'default_db')
-        self.collections = os.getenv('MONGO_COLLECTIONS', '').split(',')
-        self.collections = [c.strip() for c in self.collections if c.strip()]
-        
-        # Email config
-        self.email_from = os.getenv('EMAIL_FROM')
-        self.email_to = os.getenv('EMAIL_TO')
-        self.email_cc = os.getenv('EMAIL_CC', '')
-        self.azure_tenant = os.getenv('AZURE_TENANT_ID')
-        self.azure_client = os.getenv('AZURE_CLIENT_ID')
-        self.azure_secret = os.getenv('AZURE_CLIENT_SECRET')
-        
-        if not self.gcs_bucket:
-            raise ValueError('GCS_BUCKET environment variable is required')
-        
-        self.mongo_client = None
-        self.gcs_client = None
-        self.backup_info = []
-        self.backup_timestamp = datetime.utcnow().strftime('%Y-%m-%d_%H-%M-%S')
-    
-    def connect_mongo(self) -> bool:
-        """Connect to MongoDB"""
-        try:
-            self.mongo_client = MongoClient(self.mongo_uri, serverSelectionTimeoutMS=5000)
-            self.mongo_client.admin.command('ping')
-            logger.info('✅ Successfully connected to MongoDB')
-            return True
-        except PyMongoError as e:
-            logger.error(f'❌ Failed to connect to MongoDB: {e}')
-            return False
-    
-    def connect_gcs(self) -> bool:
-        """Connect to Google Cloud Storage"""
-        try:
-            self.gcs_client = storage.Client(project=self.gcs_project)
-            bucket = self.gcs_client.bucket(self.gcs_bucket)
-            bucket.reload()
-            logger.info(f'✅ Successfully connected to GCS bucket: {self.gcs_bucket}')
-            return True
-        except Exception as e:
-            logger.error(f'❌ Failed to connect to GCS: {e}')
-            return False
-    
-    def get_collections_to_backup(self) -> List[str]:
-        """Get list of collections to backup"""
-        try:
-            db = self.mongo_client[self.db_name]
-            available_collections = db.list_collection_names()
-            
-            if self.collections:
-                to_backup = [c for c in self.collections if c in available_collections]
-                logger.info(f'📦 Backing up specified collections: {to_backup}')
-                return to_backup
-            else:
-                logger.info(f'📦 Backing up all collections: {available_collections}')
-                return available_collections
-        except PyMongoError as e:
-            logger.error(f'❌ Failed to list collections: {e}')
-            return []
-    
-    def export_collection_to_json(self, collection_name: str) -> Dict[str, Any]:
-        """Export a collection as JSON"""
-        try:
-            db = self.mongo_client[self.db_name]
-            collection = db[collection_name]
-            documents = list(collection.find({}))
-            
-            # Convert ObjectId to string for JSON serialization
-            for doc in documents:
-                if '_id' in doc:
-                    doc['_id'] = str(doc['_id'])
-            
-            logger.info(f'📄 Exported {len(documents)} documents from {collection_name}')
-            return {'collection': collection_name, 'count': len(documents), 'data': documents}
-        except PyMongoError as e:
-            logger.error(f'❌ Failed to export collection {collection_name}: {e}')
-            return None
-    
-    def upload_to_gcs(self, filename: str, data: Dict[str, Any]) -> bool:
-        """Upload JSON data to GCS"""
-        try:
-            bucket = self.gcs_client.bucket(self.gcs_bucket)
-            blob = bucket.blob(filename)
-            
-            json_data = json.dumps(data['data'], default=str, indent=2)
-            blob.upload_from_string(json_data, content_type='application/json')
-            
-            logger.info(f'⬆️  Uploaded {filename} to GCS')
-            return True
-        except Exception as e:
-            logger.error(f'❌ Failed to upload {filename} to GCS: {e}')
-            return False
-    
-    def backup_metadata(self) -> bool:
-        """Upload backup metadata"""
-        try:
-            timestamp = datetime.utcnow().isoformat()
-            metadata = {
-                'timestamp': timestamp,
-                'database': self.db_name,
-                'collections': self.backup_info,
-                'status': 'completed'
-            }
-            
-            filename = f'backups/metadata/{datetime.utcnow().strftime("%Y-%m-%d")}/backup-{datetime.utcnow().strftime("%H-%M-%S")}.json'
-            return self.upload_to_gcs(filename, metadata)
-        except Exception as e:
-            logger.error(f'❌ Failed to upload backup metadata: {e}')
-            return False
-    
-    def get_graph_token(self) -> str:
-        """Get Microsoft Graph API access token"""
-        try:
-            if not all([self.azure_tenant, self.azure_client, self.azure_secret]):
-                raise ValueError('Azure credentials not configured')
-            
-            token_url = f"https://login.microsoftonline.com/{self.azure_tenant}/oauth2/v2.0/token"
-            data = {
-                "grant_type": "client_credentials",
-                "client_id": self.azure_client,
-                "client_secret": self.azure_secret,
-                "scope": "https://graph.microsoft.com/.default"
-            }
-            
-            resp = requests.post(token_url, data=data, timeout=10)
-            resp.raise_for_status()
-            return resp.json()["access_token"]
-        except Exception as e:
-            logger.error(f'❌ Failed to get Graph token: {e}')
-            raise
-    
-    def send_success_email(self) -> bool:
-        """Send success email notification with IT Asset Management theme"""
-        try:
-            if not self.email_from or not self.email_to:
-                logger.warning('⚠️  Email not configured, skipping notification')
-                return False
-            
-            access_token = self.get_graph_token()
-            recipients = [r.strip() for r in self.email_to.split(',') if r.strip()]
-            cc_recipients = [r.strip() for r in self.email_cc.split(',') if r.strip()]
-            
-            now = datetime.now()
-            date_str = now.strftime("%B %d, %Y")
-            time_str = now.strftime("%I:%M %p")
-            
-            # Build collection table rows (matching your backup_info structure)
-            collection_rows = ""
-            for item in self.backup_info:
-                collection_rows += f"""
-            <tr>
-                <td style="font-size:15px;color:#6b7280;font-weight:600;padding:12px 0;width:140px;">{item['collection']}</td>
-                <td style="font-size:15px;color:#111827;font-weight:500;padding:12px 0;text-align:right;">{item['documents']}</td>
-            </tr>
-            """
-            
-            html_content = f"""<!DOCTYPE html>
+# Export threads only enqueue records; a listener thread does the stderr writes
+_LOG_QUEUE = queue.Queue(-1)
+_LOG_HANDLER = logging.StreamHandler()
+_LOG_HANDLER.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_LOG_LISTENER = logging.handlers.QueueListener(_LOG_QUEUE, _LOG_HANDLER)
+_LOG_LISTENER.start()
+atexit.register(_LOG_LISTENER.stop)
+logger.addHandler(logging.handlers.QueueHandler(_LOG_QUEUE))
+logger.propagate = False
+
+# Shared HTTP session so Graph and login.microsoftonline.com connections are reused.
+# Both endpoints are POST-only, so each host gets a Retry that allows POST where it is safe.
+_SESSION = requests.Session()
+# Token requests are idempotent: retry failed connects, read timeouts, throttling and transient 5xx
+_SESSION.mount('https://login.microsoftonline.com/', HTTPAdapter(
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({'POST'}),
+    ),
+))
+# sendMail is not: a read timeout or 5xx can follow an accepted message, so retrying would send
+# duplicates. Only retry connects (nothing was sent) and 429/503, honouring Graph's Retry-After.
+_SESSION.mount('https://graph.microsoft.com/', HTTPAdapter(
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        read=0,
+        other=0,
+        backoff_factor=0.5,
+        status_forcelist=[429, 503],
+        allowed_methods=frozenset({'POST'}),
+        respect_retry_after_header=True,
+    ),
+))
+# Token fetches for the error email make a single attempt, so an outage can't hold up the failed request
+_FAIL_FAST_SESSION = requests.Session()
+_FAIL_FAST_SESSION.mount('https://', HTTPAdapter(max_retries=Retry(connect=0, read=0)))
+
+# Email templates, compiled once at import and sharing one HTML skeleton.
+# autoescape keeps collection names and error messages from injecting HTML.
+_EMAIL_LAYOUT_HTML = """<!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    {%- block style %}{% endblock %}
 </head>
+{% block body %}{% endblock %}
+</html>"""
+
+_SUCCESS_EMAIL_HTML = """{% extends "layout.html" %}
+{% block style %}
+    <style>
+        td.collection-name { font-size:15px;color:#6b7280;font-weight:600;padding:12px 0;width:140px; }
+        td.collection-count { font-size:15px;color:#111827;font-weight:500;padding:12px 0;text-align:right; }
+    </style>
+{%- endblock %}
+{% block body %}
 <body style="margin:0;padding:0;font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;background-color:#ffffff;">
     <table width="100%" cellpadding="0" cellspacing="0" style="background-color:#ffffff;padding:40px 20px;">
         <tr>
@@ -219,7 +143,9 @@ class MongoDBBackup:
                                                             <td style="font-size:15px;color:#111827;font-weight:700;padding:12px 0;width:140px;">Collection</td>
                                                             <td style="font-size:15px;color:#111827;font-weight:700;padding:12px 0;text-align:right;">Documents</td>
                                                         </tr>
-                                                        {collection_rows}
+                                                        {%- for item in backup_info %}
+                                                        <tr><td class="collection-name">{{ item.collection }}</td><td class="collection-count">{{ item.documents if item.documents is not none else 'unknown' }}</td></tr>
+                                                        {%- endfor %}
                                                     </table>
                                                 </td>
                                             </tr>
@@ -240,7 +166,7 @@ class MongoDBBackup:
                                                 <td>
                                                     <p style="margin:0 0 8px 0;font-size:15px;color:#065f46;font-weight:700;">Backup Successful</p>
                                                     <p style="margin:0;font-size:14px;color:#065f46;line-height:1.6;">
-                                                        All {len(self.backup_info)} collections backed up to gs://{self.gcs_bucket}
+                                                        All {{ backup_info|length }} collections backed up to gs://{{ bucket }}
                                                     </p>
                                                 </td>
                                             </tr>
@@ -255,10 +181,10 @@ class MongoDBBackup:
                                     <td style="padding:25px;">
                                         <p style="margin:0 0 10px 0;font-size:15px;color:#1f2937;font-weight:600;">Summary</p>
                                         <p style="margin:0;font-size:14px;color:#4b5563;line-height:1.6;">
-                                            <strong>Timestamp:</strong> {self.backup_timestamp}<br>
-                                            <strong>Database:</strong> {self.db_name}<br>
-                                            <strong>Bucket:</strong> gs://{self.gcs_bucket}<br>
-                                            <strong>Total Collections:</strong> {len(self.backup_info)}
+                                            <strong>Timestamp:</strong> {{ timestamp }}<br>
+                                            <strong>Database:</strong> {{ database }}<br>
+                                            <strong>Bucket:</strong> gs://{{ bucket }}<br>
+                                            <strong>Total Collections:</strong> {{ backup_info|length }}
                                         </p>
                                     </td>
                                 </tr>
@@ -271,7 +197,7 @@ class MongoDBBackup:
                         <td style="padding:30px 40px;background-color:#111827;text-align:center;border-top:3px solid #4f46e5;">
                             <p style="margin:0 0 8px 0;font-size:16px;font-weight:600;color:#ffffff;">IT Asset Management System</p>
                             <p style="margin:15px 0 0 0;font-size:12px;color:#9ca3af;line-height:1.6;">
-                                This is an automated backup notification. Generated on {date_str} at {time_str}.
+                                This is an automated backup notification. Generated on {{ date_str }} at {{ time_str }}.
                             </p>
                         </td>
                     </tr>
@@ -280,26 +206,716 @@ class MongoDBBackup:
         </tr>
     </table>
 </body>
-</html>"""
+{% endblock %}"""
+
+_ERROR_EMAIL_HTML = """{% extends "layout.html" %}
+{% block body %}
+<body style="font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;background-color:#f9fafb;">
+    <div style="max-width:700px;margin:20px auto;border:1px solid #e5e7eb;border-radius:8px;padding:30px;background-color:white;box-shadow:0 1px 3px rgba(0,0,0,0.1);">
+        <h2 style="color:#dc2626;margin-top:0;margin-bottom:10px;">❌ MongoDB Backup Failed</h2>
+        <hr style="border:none;border-top:2px solid #e5e7eb;margin:15px 0;">
+
+        <div style="background-color:#fef2f2;border-left:4px solid #ef4444;padding:15px;margin:15px 0;border-radius:4px;">
+            <strong style="color:#7f1d1d;">Status:</strong> <span style="color:#991b1b;">FAILED</span>
+        </div>
+
+        <h3 style="color:#1f2937;margin-top:20px;">Error Details</h3>
+        <div style="background-color:#fef2f2;padding:15px;border-radius:4px;font-family:monospace;font-size:13px;color:#7f1d1d;overflow-x:auto;">
+            {{ error_msg }}
+        </div>
+
+        <p style="margin:20px 0;font-size:14px;color:#4b5563;">
+            <strong>Database:</strong> {{ database }}<br>
+            <strong>Storage Bucket:</strong> gs://{{ bucket }}<br>
+            <strong>Attempted Backup Time:</strong> {{ timestamp }}
+        </p>
+
+        <p style="margin:20px 0;font-size:13px;color:#d97706;background-color:#fffbeb;padding:10px;border-radius:4px;border-left:3px solid #fbbf24;">
+            ⚠️ Please investigate the error and ensure your MongoDB connection and GCS permissions are properly configured.
+        </p>
+
+        <hr style="border:none;border-top:1px solid #e5e7eb;margin:20px 0;">
+        <p style="margin:10px 0;font-size:12px;color:#9ca3af;">
+            Generated at: {{ generated_at }}
+        </p>
+    </div>
+</body>
+{% endblock %}"""
+
+_EMAIL_TEMPLATES = jinja2.Environment(
+    loader=jinja2.DictLoader({
+        'layout.html': _EMAIL_LAYOUT_HTML,
+        'success.html': _SUCCESS_EMAIL_HTML,
+        'error.html': _ERROR_EMAIL_HTML,
+    }),
+    autoescape=True,
+)
+_SUCCESS_TEMPLATE = _EMAIL_TEMPLATES.get_template('success.html')
+_ERROR_TEMPLATE = _EMAIL_TEMPLATES.get_template('error.html')
+
+# Process-wide clients: topology discovery, TLS/auth and credential lookup happen once
+# per container and are reused by every backup run on a warm instance. They are built on
+# first use so importing the app (and serving health checks) skips the ADC metadata lookup.
+_MONGO: Optional[MongoClient] = None
+_GCS: Optional[storage.Client] = None
+_CLIENTS_LOCK = threading.Lock()
+
+def _get_mongo() -> MongoClient:
+    """Return the shared MongoDB client, creating it on first use"""
+    global _MONGO
+    with _CLIENTS_LOCK:
+        if _MONGO is None:
+            _MONGO = MongoClient(
+                os.getenv('MONGO_URI', 'mongodb://localhost:27017'),
+                serverSelectionTimeoutMS=5000,
+                # Room for every concurrent collection cursor plus the stats/ping commands around them
+                maxPoolSize=max(20, int(os.getenv('BACKUP_CONCURRENCY', '8')) * 2),
+                minPoolSize=4,
+                # Large getMore batches can take a while to arrive on a slow link
+                socketTimeoutMS=600000,
+                # Wire compression; zstd uses the zstandard package already required for dumps
+                compressors='zstd,zlib',
+                zlibCompressionLevel=1,
+                retryReads=True,
+                # Long backup scans go to a secondary when one is available
+                readPreference=os.getenv('MONGO_READ_PREFERENCE', 'secondaryPreferred'),
+            )
+        return _MONGO
+
+def _get_gcs() -> storage.Client:
+    """Return the shared Google Cloud Storage client, creating it on first use"""
+    global _GCS
+    with _CLIENTS_LOCK:
+        if _GCS is None:
+            _GCS = storage.Client(project=os.getenv('GCP_PROJECT_ID'))
+        return _GCS
+
+# Graph access token shared by every backup run on a warm instance, keyed by tenant and client id
+_TOKEN_CACHE: Dict[str, Any] = {'key': None, 'token': None, 'exp': 0.0}
+_TOKEN_LOCK = threading.Lock()
+
+# Background senders for EMAIL_ASYNC, shared across runs so emails outlive the request
+_NOTIFY_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='notify')
+
+# Resumable upload chunks must be a multiple of 256 KiB
+_GCS_CHUNK_ALIGNMENT = 256 * 1024
+
+# Supported BACKUP_COMPRESSION values: file suffix, blob content type and default level
+# (gzip level 1 is several times faster than the default 9 for a few percent more bytes on JSON)
+_COMPRESSION_FORMATS = {
+    'zstd': ('.zst', 'application/zstd', 3),
+    'gzip': ('.gz', 'application/gzip', 1),
+    'none': ('', 'application/x-ndjson', 0),
+}
+
+# Only request the fields the age check needs when listing blobs
+_BLOB_LIST_FIELDS = 'items(name,timeCreated),nextPageToken'
+
+# Maximum number of calls GCS accepts in one batch request
+_GCS_BATCH_LIMIT = 100
+
+# Maximum number of source objects a single GCS compose request accepts
+_GCS_COMPOSE_LIMIT = 32
+
+# BSON dates decode as naive UTC datetimes; tag them as UTC with a trailing Z
+_DOCUMENT_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+# Encoded documents are handed to writers in runs of about this size
+_ENCODE_RUN_SIZE = 1024 * 1024
+
+# Encoded runs buffered ahead of the upload by the cursor reader thread
+_READ_AHEAD_RUNS = 4
+
+# Beyond these sizes the email is a short text summary linking to the details in GCS
+_EMAIL_ERROR_INLINE_LIMIT = 4096
+_EMAIL_COLLECTIONS_INLINE_LIMIT = 100
+
+class _HashingWriter:
+    """File-like wrapper that hashes and counts the bytes written through it"""
+    
+    def __init__(self, inner):
+        self.inner = inner
+        self.hash = hashlib.blake2b(digest_size=16)
+        self.bytes = 0
+    
+    def write(self, data) -> int:
+        self.hash.update(data)
+        self.bytes += len(data)
+        return self.inner.write(data)
+    
+    def flush(self) -> None:
+        self.inner.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Size and digest of the stored object, checkable with `b2sum -l 128`"""
+        return {'bytes': self.bytes, 'blake2b': self.hash.hexdigest()}
+
+def _read_ahead(items: Iterable, depth: int = _READ_AHEAD_RUNS) -> Iterator:
+    """Produce items on a background thread so the consumer's I/O overlaps the producer's
+    
+    Close the generator (contextlib.closing) so the producer stops if the consumer fails.
+    """
+    pending = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    finished = object()
+    
+    def offer(entry) -> bool:
+        while not stop.is_set():
+            try:
+                pending.put(entry, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce() -> None:
+        try:
+            for item in items:
+                if not offer((item, None)):
+                    return
+            offer((finished, None))
+        except BaseException as e:
+            offer((None, e))
+    
+    producer = threading.Thread(target=produce, name='read-ahead', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = pending.get()
+            if error is not None:
+                raise error
+            if item is finished:
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+def _is_precondition_failure(error: Exception) -> bool:
+    """Whether a GCS call failed an if_generation_match check (HTTP 412)
+    
+    Resumable chunk uploads surface this as a raw InvalidResponse rather than PreconditionFailed.
+    """
+    if isinstance(error, PreconditionFailed):
+        return True
+    return isinstance(error, InvalidResponse) and getattr(error.response, 'status_code', None) == 412
+
+def _gcs_console_url(bucket: str, name: str) -> str:
+    """Authenticated browser link to an object in GCS"""
+    return f'https://storage.cloud.google.com/{bucket}/{name}'
+
+# Stringified as the old json.dumps(default=str) did
+_BSON_STR_TYPES = (ObjectId, Decimal128, Timestamp, Regex, DBRef, MinKey, MaxKey)
+
+def _bson_default(obj: Any) -> Any:
+    """Serialize BSON types that orjson does not handle natively
+    
+    bytes become base64 and the other BSON scalars their str(); anything else raises TypeError.
+    """
+    if isinstance(obj, _BSON_STR_TYPES):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return base64.b64encode(obj).decode('ascii')
+    raise TypeError(f'Type is not JSON serializable: {type(obj).__name__}')
+
+def _is_expired(blob: Any, cutoff_date: datetime) -> bool:
+    """Check a listed blob's creation time against a naive UTC cutoff"""
+    return bool(blob.time_created) and blob.time_created.replace(tzinfo=None) < cutoff_date
+
+def _folder_end_time(prefix: str) -> Optional[datetime]:
+    """Latest time a dated backup folder can hold, or None if its name is not a date"""
+    name = prefix.rstrip('/').rsplit('/', 1)[-1]
+    try:
+        return datetime.strptime(name, '%Y-%m-%d_%H-%M-%S')
+    except ValueError:
+        pass
+    try:
+        # Day folders (metadata) hold anything written up to the end of that day
+        return datetime.strptime(name, '%Y-%m-%d') + timedelta(days=1)
+    except ValueError:
+        return None
+
+class MongoDBBackup:
+    def __init__(self):
+        self.mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
+        self.gcs_bucket = os.getenv('GCS_BUCKET')
+        self.gcs_project = os.getenv('GCP_PROJECT_ID')
+        self.db_name = os.getenv('MONGO_DB_NAME', 'default_db')
+        self.collections = os.getenv('MONGO_COLLECTIONS', '').split(',')
+        self.collections = [c.strip() for c in self.collections if c.strip()]
+        # Relaxed Extended JSON keeps BSON types (ObjectId, dates) restorable via mongoimport
+        self.extended_json = os.getenv('BACKUP_EXTENDED_JSON', 'false').lower() == 'true'
+        # 'native' streams mongodump archives instead of exporting JSON: one for the whole database,
+        # or one per collection when MONGO_COLLECTIONS is set
+        self.backup_mode = os.getenv('BACKUP_MODE', 'json').lower()
+        # Indent the JSON metadata file for debugging; collection dumps always stay one document per line
+        self.pretty = os.getenv('BACKUP_PRETTY', 'false').lower() == 'true'
+        self.batch_size = int(os.getenv('MONGO_BATCH_SIZE', '10000'))
+        # Collections whose uncompressed size exceeds this are uploaded as parallel composed parts (0 disables);
+        # 256 MiB of JSON is roughly 32 MiB after compression, where parallel streams start to pay off.
+        # Each part holds a BACKUP_CHUNK_SIZE_MB upload buffer, ~4 MiB of queued runs and a ~3.5 MiB zstd
+        # compressor, so one composite export needs ~125 MiB at the defaults; only one runs at a time.
+        self.composite_threshold = int(float(os.getenv('BACKUP_COMPOSITE_THRESHOLD_MB', '256')) * 1024 * 1024)
+        # Parallel part uploads per composite dump; one compose request takes at most 32 sources
+        self.composite_parts = min(_GCS_COMPOSE_LIMIT, max(1, int(os.getenv('MAX_UPLOAD_WORKERS', '8'))))
+        # Number of collections exported at the same time
+        self.concurrency = max(1, int(os.getenv('BACKUP_CONCURRENCY', '8')))
+        # Exhaust cursors stream every batch without getMore round trips (not supported by mongos)
+        self.exhaust_cursor = os.getenv('MONGO_EXHAUST_CURSOR', 'false').lower() == 'true'
+        chunk_size_mb = float(os.getenv('BACKUP_CHUNK_SIZE_MB', '8'))
+        chunk_units = max(1, int(chunk_size_mb * 1024 * 1024) // _GCS_CHUNK_ALIGNMENT)
+        self.upload_chunk_size = chunk_units * _GCS_CHUNK_ALIGNMENT
+        
+        # Email config
+        self.email_from = os.getenv('EMAIL_FROM')
+        self.email_to = os.getenv('EMAIL_TO')
+        self.email_cc = os.getenv('EMAIL_CC', '')
+        self.recipients = [r.strip() for r in (self.email_to or '').split(',') if r.strip()]
+        self.cc_recipients = [r.strip() for r in self.email_cc.split(',') if r.strip()]
+        # Return without waiting on Graph; needs CPU allocated outside requests (e.g. Cloud Run --no-cpu-throttling)
+        self.async_email = os.getenv('EMAIL_ASYNC', 'false').lower() == 'true'
+        self.azure_tenant = os.getenv('AZURE_TENANT_ID')
+        self.azure_client = os.getenv('AZURE_CLIENT_ID')
+        self.azure_secret = os.getenv('AZURE_CLIENT_SECRET')
+        
+        if not self.gcs_bucket:
+            raise ValueError('GCS_BUCKET environment variable is required')
+        
+        self.compression = os.getenv('BACKUP_COMPRESSION', 'zstd').lower()
+        if self.compression not in _COMPRESSION_FORMATS:
+            raise ValueError(f'BACKUP_COMPRESSION must be one of {", ".join(_COMPRESSION_FORMATS)}')
+        self.compression_level = int(os.getenv('BACKUP_COMPRESSION_LEVEL', _COMPRESSION_FORMATS[self.compression][2]))
+        
+        self.mongo_client = None
+        self._db = None
+        self.gcs_client = None
+        self.bucket = None
+        self.verify_bucket = os.getenv('GCS_VERIFY_BUCKET', 'false').lower() == 'true'
+        self.backup_info = []
+        self._backup_info_lock = threading.Lock()
+        # Composite exports hold composite_parts upload buffers each, so only one runs at a time
+        self._composite_lock = threading.Lock()
+        # One clock reading per run so the dump folder, metadata and emails all agree
+        self._now = datetime.utcnow()
+        self.backup_date = self._now.strftime('%Y-%m-%d')
+        self.backup_hms = self._now.strftime('%H-%M-%S')
+        self.backup_iso = f'{self._now.isoformat()}Z'
+        self.backup_timestamp = f'{self.backup_date}_{self.backup_hms}'
+        self.metadata_file = f'backups/metadata/{self.backup_date}/backup-{self.backup_hms}.json'
+    
+    def connect_mongo(self) -> bool:
+        """Check the shared MongoDB client is reachable"""
+        try:
+            self.mongo_client = _get_mongo()
+            self.mongo_client.admin.command('ping')
+            self._db = self.mongo_client[self.db_name]
+            logger.info('✅ Successfully connected to MongoDB')
+            return True
+        except PyMongoError as e:
+            logger.error(f'❌ Failed to connect to MongoDB: {e}')
+            return False
+    
+    def connect_gcs(self) -> bool:
+        """Bind the shared Google Cloud Storage client and bucket handle
+        
+        The bucket is only probed with a metadata request when GCS_VERIFY_BUCKET is set;
+        otherwise a missing bucket or permission problem surfaces on the first upload.
+        """
+        try:
+            self.gcs_client = _get_gcs()
+            self.bucket = self.gcs_client.bucket(self.gcs_bucket)
+            if self.verify_bucket:
+                self.bucket.reload()
+                logger.info(f'✅ Successfully connected to GCS bucket: {self.gcs_bucket}')
+            return True
+        except Exception as e:
+            logger.error(f'❌ Failed to connect to GCS: {e}')
+            return False
+    
+    def get_collections_to_backup(self) -> List[str]:
+        """Get list of collections to backup"""
+        try:
+            available_collections = self._db.list_collection_names()
+            
+            if self.collections:
+                available = set(available_collections)
+                to_backup = [c for c in self.collections if c in available]
+                logger.info(f'📦 Backing up specified collections: {to_backup}')
+                return to_backup
+            else:
+                logger.info(f'📦 Backing up all collections: {available_collections}')
+                return available_collections
+        except PyMongoError as e:
+            logger.error(f'❌ Failed to list collections: {e}')
+            return []
+    
+    def export_collection_to_json(self, collection_name: str, filename: str) -> Optional[Dict[str, Any]]:
+        """Stream a collection to GCS as compressed newline-delimited JSON, returning its document count and digest
+        
+        Restore with `gsutil cat gs://<bucket>/<file> | zstd -d` (or `gunzip` for BACKUP_COMPRESSION=gzip).
+        """
+        blob = None
+        try:
+            count = 0
+            content_type = _COMPRESSION_FORMATS[self.compression][1]
+            # An explicit session keeps the no-timeout cursor alive past the 30 minute session idle limit
+            with self.mongo_client.start_session() as session, self._find_all(collection_name, session) as cursor:
+                # Only bound once the writer opens: an earlier failure has written nothing to clean up
+                blob = self.bucket.blob(filename)
+                # crc32c is validated end-to-end using the SSE4.2-accelerated google-crc32c extension
+                # if_generation_match=0 refuses to overwrite an existing backup object
+                with blob.open('wb', content_type=content_type, chunk_size=self.upload_chunk_size,
+                               checksum='crc32c', if_generation_match=0) as raw:
+                    # The digest covers the stored (compressed) bytes, so a download can be checked directly
+                    hashed = _HashingWriter(raw)
+                    # getMore round-trips and encoding run on a reader thread while chunks upload here
+                    with self._compressed_writer(hashed) as stream, \
+                            contextlib.closing(_read_ahead(self._encoded_runs(cursor))) as runs:
+                        for run, docs in runs:
+                            stream.write(run)
+                            count += docs
+            
+            logger.info('📄 Exported %d documents from %s to %s', count, collection_name, filename)
+            return {'documents': count, **hashed.stats()}
+        except Exception as e:
+            if _is_precondition_failure(e):
+                # Another run already wrote this object; it is theirs, so leave it alone
+                logger.error('❌ Failed to export collection %s: %s already exists', collection_name, filename)
+                return None
+            logger.error('❌ Failed to export collection %s: %s', collection_name, e)
+            if blob is not None:
+                self._discard_blob(blob)
+            return None
+    
+    def export_database_native(self, filename: str, collection_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Stream a gzipped mongodump archive to GCS, returning its size and digest
+        
+        Dumps the whole database, or just `collection_name` when given. BSON is dumped as-is,
+        which is much faster and smaller than JSON.
+        Restore with `gsutil cat gs://<bucket>/<file> | mongorestore --archive --gzip`.
+        """
+        source = f'collection {collection_name}' if collection_name else f'database {self.db_name}'
+        blob = None
+        try:
+            cmd = ['mongodump', f'--uri={self.mongo_uri}', f'--db={self.db_name}', '--archive', '--gzip']
+            if collection_name:
+                cmd.append(f'--collection={collection_name}')
+            else:
+                # Whole-database dumps read this many collections at once (mongodump defaults to 4)
+                cmd.append(f'--numParallelCollections={self.concurrency}')
+            # Scan a secondary like the JSON export does; mongodump rejects the flag if the URI already sets one
+            if 'readpreference=' not in self.mongo_uri.lower():
+                cmd.append(f"--readPreference={os.getenv('MONGO_READ_PREFERENCE', 'secondaryPreferred')}")
+            # mongodump's progress output on stderr goes straight to the container log
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+            
+            blob = self.bucket.blob(filename)
+            try:
+                # if_generation_match=0 refuses to overwrite an archive written by an overlapping run
+                with blob.open('wb', content_type='application/gzip', chunk_size=self.upload_chunk_size,
+                               checksum='crc32c', if_generation_match=0) as raw:
+                    hashed = _HashingWriter(raw)
+                    shutil.copyfileobj(proc.stdout, hashed, self.upload_chunk_size)
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, cmd[0])
+            
+            logger.info('📄 Dumped %s to %s', source, filename)
+            return hashed.stats()
+        except Exception as e:
+            if _is_precondition_failure(e):
+                # Another run already wrote this archive; it is theirs, so leave it alone
+                logger.error('❌ Failed to dump %s: %s already exists', source, filename)
+                return None
+            logger.error('❌ Failed to dump %s: %s', source, e)
+            if blob is not None:
+                self._discard_blob(blob)
+            return None
+    
+    def export_collection_composite(self, collection_name: str, filename: str) -> Optional[Dict[str, Any]]:
+        """Stream a large collection into parallel part uploads, then compose them into one dump
+        
+        A single resumable upload is limited to one TCP stream. Here the cursor deals ~1 MiB runs of
+        encoded documents round-robin to part writers, each uploading its own compressed stream on
+        a separate thread. Concatenated zstd frames / gzip members / NDJSON lines read back as one
+        file, so GCS compose yields a normal dump; only the line order differs from the cursor's.
+        Hashing the composed object would need a second pass, so its GCS crc32c is recorded instead.
+        """
+        # Parts are unique to this writer, so an overlapping run can't overwrite or delete them
+        part_prefix = f'{filename}.parts/{uuid.uuid4().hex[:12]}'
+        part_blobs = [self.bucket.blob(f'{part_prefix}-{i:02d}') for i in range(self.composite_parts)]
+        queues = [queue.Queue(maxsize=4) for _ in part_blobs]
+        final = self.bucket.blob(filename)
+        try:
+            count = 0
+            with ThreadPoolExecutor(max_workers=len(part_blobs)) as executor:
+                writers = [executor.submit(self._write_part, blob, q) for blob, q in zip(part_blobs, queues)]
+                try:
+                    with self.mongo_client.start_session() as session, self._find_all(collection_name, session) as cursor:
+                        for part, (run, docs) in enumerate(self._encoded_runs(cursor)):
+                            self._put_part(queues[part % len(queues)], writers[part % len(writers)], run)
+                            count += docs
+                finally:
+                    # Let every live writer finish its upload, even when the export failed
+                    for q, writer in zip(queues, writers):
+                        self._put_part(q, writer, None, raise_on_exit=False)
+                for writer in writers:
+                    writer.result()
+            
+            final.content_type = _COMPRESSION_FORMATS[self.compression][1]
+            final.compose(part_blobs, if_generation_match=0)
+            logger.info('📄 Exported %d documents from %s to %s in %d parts',
+                        count, collection_name, filename, len(part_blobs))
+            return {'documents': count, 'bytes': final.size, 'crc32c': final.crc32c}
+        except Exception as e:
+            # compose is atomic, so the destination is never partial and a 412 means another run owns it;
+            # either way there is nothing of ours to delete besides the parts
+            if _is_precondition_failure(e):
+                logger.error('❌ Failed to export collection %s: %s already exists', collection_name, filename)
+            else:
+                logger.error('❌ Failed to export collection %s: %s', collection_name, e)
+            return None
+        finally:
+            for blob in part_blobs:
+                self._discard_blob(blob)
+    
+    def _encoded_runs(self, cursor: Iterable) -> Iterator[Tuple[bytes, int]]:
+        """Encode documents as NDJSON, yielding runs of about 1 MiB with their document counts"""
+        run = bytearray()
+        docs = 0
+        for doc in cursor:
+            run += self._encode_document(doc)
+            run += b'\n'
+            docs += 1
+            if len(run) >= _ENCODE_RUN_SIZE:
+                yield bytes(run), docs
+                run.clear()
+                docs = 0
+        if run:
+            yield bytes(run), docs
+    
+    def _write_part(self, blob, chunks: queue.Queue) -> None:
+        """Upload one composite part from a queue of encoded runs until a None sentinel"""
+        with blob.open('wb', content_type='application/octet-stream', chunk_size=self.upload_chunk_size,
+                       checksum='crc32c') as raw:
+            # The parts already compress in parallel; a multithreaded compressor each would cost ~20 MiB apiece
+            with self._compressed_writer(raw, threads=0) as stream:
+                while True:
+                    chunk = chunks.get()
+                    if chunk is None:
+                        break
+                    stream.write(chunk)
+    
+    def _put_part(self, chunks: queue.Queue, writer, item: Optional[bytes], raise_on_exit: bool = True) -> None:
+        """Hand a run to a part writer without blocking forever if that writer has died"""
+        while not writer.done():
+            try:
+                chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+        if raise_on_exit:
+            writer.result()
+            raise RuntimeError('composite part writer exited early')
+    
+    def _estimated_size(self, collection_name: str) -> int:
+        """Uncompressed data size of a collection from collStats, or 0 if unavailable"""
+        try:
+            return int(self._db.command('collStats', collection_name).get('size', 0))
+        except PyMongoError as e:
+            logger.warning(f'⚠️  Could not read size of {collection_name}: {e}')
+            return 0
+    
+    def _estimated_count(self, collection_name: str) -> Optional[int]:
+        """Document count from collection metadata, or None if unavailable"""
+        try:
+            return self._db[collection_name].estimated_document_count()
+        except PyMongoError as e:
+            logger.warning(f'⚠️  Could not count documents in {collection_name}: {e}')
+            return None
+    
+    def _compressed_writer(self, raw, threads: int = -1):
+        """Wrap a blob writer in the configured compressor, leaving the blob open on exit
+        
+        threads only applies to zstd: -1 uses one worker per core, 0 compresses on the calling thread.
+        """
+        if self.compression == 'zstd':
+            # threads=-1 compresses on worker threads, overlapping with the GCS socket writes
+            cctx = zstandard.ZstdCompressor(level=self.compression_level, threads=threads)
+            return cctx.stream_writer(raw, closefd=False)
+        if self.compression == 'gzip':
+            # ISA-L only implements levels 0-3; higher levels fall back to zlib.
+            # mtime=0 and no filename keep the header deterministic, so identical data hashes identically.
+            gzip_file = igzip.IGzipFile if igzip is not None and self.compression_level <= 3 else gzip.GzipFile
+            return gzip_file(filename='', fileobj=raw, mode='wb', compresslevel=self.compression_level, mtime=0)
+        return contextlib.nullcontext(raw)
+    
+    def _find_all(self, collection_name: str, session) -> Cursor:
+        """Open a batched cursor over every document in a collection"""
+        db = self._db
+        if self.extended_json:
+            # Keep documents as raw BSON; json_util encodes them with their BSON types intact
+            collection = db.get_collection(
+                collection_name, codec_options=CodecOptions(document_class=RawBSONDocument)
+            )
+        else:
+            collection = db[collection_name]
+        # Exports can outlive the 10 minute idle cursor timeout while GCS drains a chunk
+        return collection.find(
+            {},
+            self.get_projection(collection_name),
+            batch_size=self.batch_size,
+            no_cursor_timeout=True,
+            cursor_type=CursorType.EXHAUST if self.exhaust_cursor else CursorType.NON_TAILABLE,
+            session=session,
+        )
+    
+    def get_projection(self, collection_name: str) -> Optional[Dict[str, Any]]:
+        """Read an optional projection for a collection from MONGO_PROJECTION_<COLLECTION>
+        
+        The collection name is upper-cased with non-alphanumerics mapped to '_' so names like
+        'asset-history' can be configured (MONGO_PROJECTION_ASSET_HISTORY); the verbatim name
+        is still honoured.
+        """
+        env_name = re.sub(r'[^A-Z0-9]', '_', collection_name.upper())
+        projection = os.getenv(f'MONGO_PROJECTION_{env_name}') or os.getenv(f'MONGO_PROJECTION_{collection_name}')
+        if not projection:
+            return None
+        return orjson.loads(projection)
+    
+    def _encode_document(self, doc: Any) -> bytes:
+        """Encode a single document as one JSON line"""
+        if self.extended_json:
+            return json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS).encode('utf-8')
+        
+        # ObjectIds, including nested references, are stringified by _bson_default during encoding
+        return orjson.dumps(doc, default=_bson_default, option=_DOCUMENT_JSON_OPTIONS)
+    
+    def _discard_blob(self, blob) -> None:
+        """Delete a partially written blob so a failed export never looks like a backup"""
+        try:
+            blob.delete()
+        except Exception:
+            pass
+    
+    def upload_to_gcs(self, filename: str, data: Dict[str, Any]) -> bool:
+        """Upload JSON data to GCS"""
+        try:
+            blob = self.bucket.blob(filename)
+            
+            option = orjson.OPT_NON_STR_KEYS
+            if self.pretty:
+                option |= orjson.OPT_INDENT_2
+            json_data = orjson.dumps(data, default=_bson_default, option=option)
+            blob.upload_from_string(json_data, content_type='application/json', checksum='crc32c')
+            
+            logger.info('⬆️  Uploaded %s to GCS', filename)
+            return True
+        except Exception as e:
+            logger.error('❌ Failed to upload %s to GCS: %s', filename, e)
+            return False
+    
+    def backup_metadata(self) -> bool:
+        """Upload backup metadata"""
+        try:
+            metadata = {
+                'timestamp': self.backup_iso,
+                'database': self.db_name,
+                'collections': self.backup_info,
+                'status': 'completed'
+            }
+            
+            return self.upload_to_gcs(self.metadata_file, metadata)
+        except Exception as e:
+            logger.error(f'❌ Failed to upload backup metadata: {e}')
+            return False
+    
+    def get_graph_token(self, fail_fast: bool = False) -> str:
+        """Get Microsoft Graph API access token, reusing it until shortly before expiry
+        
+        Failures are raised for the caller to log. fail_fast makes one attempt with a 3 s connect timeout.
+        """
+        key = f'{self.azure_tenant}/{self.azure_client}'
+        with _TOKEN_LOCK:
+            if _TOKEN_CACHE['key'] == key and time.monotonic() < _TOKEN_CACHE['exp'] - 60:
+                return _TOKEN_CACHE['token']
+            return self._fetch_graph_token(key, _FAIL_FAST_SESSION if fail_fast else _SESSION)
+    
+    def _fetch_graph_token(self, key: str, session: requests.Session) -> str:
+        """Request a new client-credentials token and store it in the shared cache"""
+        if not all([self.azure_tenant, self.azure_client, self.azure_secret]):
+            raise ValueError('Azure credentials not configured')
+        
+        token_url = f"https://login.microsoftonline.com/{self.azure_tenant}/oauth2/v2.0/token"
+        data = {
+            "grant_type": "client_credentials",
+            "client_id": self.azure_client,
+            "client_secret": self.azure_secret,
+            "scope": "https://graph.microsoft.com/.default"
+        }
+        
+        resp = session.post(token_url, data=data, timeout=(3, 10))
+        resp.raise_for_status()
+        token = orjson.loads(resp.content)
+        # Client-credentials tokens last an hour when the response omits expires_in
+        _TOKEN_CACHE.update(key=key, token=token["access_token"],
+                            exp=time.monotonic() + int(token.get("expires_in", 3600)))
+        return _TOKEN_CACHE['token']
+    
+    def send_success_email(self) -> bool:
+        """Send success email notification with IT Asset Management theme"""
+        try:
+            # Checked before the token fetch, so a blank or ',' EMAIL_TO costs no Graph round-trips
+            if not self.email_from or not self.recipients:
+                logger.warning('⚠️  Email not configured, skipping notification')
+                return False
+            
+            access_token = self.get_graph_token()
+            if len(self.backup_info) > _EMAIL_COLLECTIONS_INLINE_LIMIT:
+                # A row per collection makes a huge HTML body; the metadata file already lists them
+                total = sum(item['documents'] or 0 for item in self.backup_info)
+                body = {
+                    "contentType": "Text",
+                    "content": (
+                        f"Backup of {self.db_name} completed at {self.backup_iso}: "
+                        f"{len(self.backup_info)} collections, {total} documents.\n\n"
+                        f"Details: {_gcs_console_url(self.gcs_bucket, self.metadata_file)}"
+                    ),
+                }
+            else:
+                date_str = self._now.strftime("%B %d, %Y")
+                time_str = self._now.strftime("%I:%M %p")
+                
+                html_content = _SUCCESS_TEMPLATE.render(
+                    backup_info=self.backup_info,
+                    bucket=self.gcs_bucket,
+                    timestamp=self.backup_timestamp,
+                    database=self.db_name,
+                    date_str=date_str,
+                    time_str=time_str,
+                )
+                body = {"contentType": "HTML", "content": html_content}
             
             message = {
                 "message": {
                     "subject": f"🗄️ Asset Backup Completed - {self.backup_timestamp}",
-                    "body": {"contentType": "HTML", "content": html_content},
-                    "toRecipients": [{"emailAddress": {"address": addr}} for addr in recipients],
+                    "body": body,
+                    "toRecipients": [{"emailAddress": {"address": addr}} for addr in self.recipients],
                 }
             }
             
-            if cc_recipients:
-                message["message"]["ccRecipients"] = [{"emailAddress": {"address": addr}} for addr in cc_recipients]
+            if self.cc_recipients:
+                message["message"]["ccRecipients"] = [{"emailAddress": {"address": addr}} for addr in self.cc_recipients]
             
             url = f"https://graph.microsoft.com/v1.0/users/{self.email_from}/sendMail"
             headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
             
-            resp = requests.post(url, headers=headers, json=message, timeout=30)
+            resp = _SESSION.post(url, headers=headers, data=orjson.dumps(message), timeout=(5, 30))
             
             if resp.status_code < 300:
-                logger.info(f'📧 Success email sent to {len(recipients)} recipients {"+ CC" if cc_recipients else ""}')
+                logger.info(f'📧 Success email sent to {len(self.recipients)} recipients {"+ CC" if self.cc_recipients else ""}')
                 return True
             else:
                 logger.error(f'❌ Email failed: {resp.text}')
@@ -311,69 +927,47 @@ class MongoDBBackup:
     def send_error_email(self, error_msg: str) -> bool:
         """Send error notification email"""
         try:
-            if not self.email_from or not self.email_to:
+            if not self.email_from or not self.recipients:
                 logger.warning('⚠️  Email not configured, skipping notification')
                 return False
             
-            access_token = self.get_graph_token()
-            recipients = [r.strip() for r in self.email_to.split(',') if r.strip()]
-            cc_recipients = [r.strip() for r in self.email_cc.split(',') if r.strip()]
+            try:
+                access_token = self.get_graph_token(fail_fast=True)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                # The backup already failed; don't keep the caller waiting on an unreachable login endpoint
+                logger.warning(f'⚠️  Error email skipped, Graph login unreachable: {e}')
+                return False
             
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head><meta charset="UTF-8"></head>
-            <body style="font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;background-color:#f9fafb;">
-                <div style="max-width:700px;margin:20px auto;border:1px solid #e5e7eb;border-radius:8px;padding:30px;background-color:white;box-shadow:0 1px 3px rgba(0,0,0,0.1);">
-                    <h2 style="color:#dc2626;margin-top:0;margin-bottom:10px;">❌ MongoDB Backup Failed</h2>
-                    <hr style="border:none;border-top:2px solid #e5e7eb;margin:15px 0;">
-                    
-                    <div style="background-color:#fef2f2;border-left:4px solid #ef4444;padding:15px;margin:15px 0;border-radius:4px;">
-                        <strong style="color:#7f1d1d;">Status:</strong> <span style="color:#991b1b;">FAILED</span>
-                    </div>
-                    
-                    <h3 style="color:#1f2937;margin-top:20px;">Error Details</h3>
-                    <div style="background-color:#fef2f2;padding:15px;border-radius:4px;font-family:monospace;font-size:13px;color:#7f1d1d;overflow-x:auto;">
-                        {error_msg}
-                    </div>
-                    
-                    <p style="margin:20px 0;font-size:14px;color:#4b5563;">
-                        <strong>Database:</strong> {self.db_name}<br>
-                        <strong>Storage Bucket:</strong> gs://{self.gcs_bucket}<br>
-                        <strong>Attempted Backup Time:</strong> {self.backup_timestamp}
-                    </p>
-                    
-                    <p style="margin:20px 0;font-size:13px;color:#d97706;background-color:#fffbeb;padding:10px;border-radius:4px;border-left:3px solid #fbbf24;">
-                        ⚠️ Please investigate the error and ensure your MongoDB connection and GCS permissions are properly configured.
-                    </p>
-                    
-                    <hr style="border:none;border-top:1px solid #e5e7eb;margin:20px 0;">
-                    <p style="margin:10px 0;font-size:12px;color:#9ca3af;">
-                        Generated at: {datetime.utcnow().isoformat()}Z
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
+            if len(error_msg) > _EMAIL_ERROR_INLINE_LIMIT:
+                body = {"contentType": "Text", "content": self._error_summary(error_msg)}
+            else:
+                html_content = _ERROR_TEMPLATE.render(
+                    error_msg=error_msg,
+                    database=self.db_name,
+                    bucket=self.gcs_bucket,
+                    timestamp=self.backup_timestamp,
+                    generated_at=self.backup_iso,
+                )
+                body = {"contentType": "HTML", "content": html_content}
             
             message = {
                 "message": {
                     "subject": f"❌ MongoDB Backup Failed - {self.backup_timestamp}",
-                    "body": {"contentType": "HTML", "content": html_content},
-                    "toRecipients": [{"emailAddress": {"address": addr}} for addr in recipients],
+                    "body": body,
+                    "toRecipients": [{"emailAddress": {"address": addr}} for addr in self.recipients],
                 }
             }
             
-            if cc_recipients:
-                message["message"]["ccRecipients"] = [{"emailAddress": {"address": addr}} for addr in cc_recipients]
+            if self.cc_recipients:
+                message["message"]["ccRecipients"] = [{"emailAddress": {"address": addr}} for addr in self.cc_recipients]
             
             url = f"https://graph.microsoft.com/v1.0/users/{self.email_from}/sendMail"
             headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
             
-            resp = requests.post(url, headers=headers, json=message, timeout=30)
+            resp = _SESSION.post(url, headers=headers, data=orjson.dumps(message), timeout=(5, 30))
             
             if resp.status_code < 300:
-                logger.info(f'📧 Error email sent to {len(recipients)} recipients')
+                logger.info(f'📧 Error email sent to {len(self.recipients)} recipients')
                 return True
             else:
                 logger.error(f'❌ Error email failed: {resp.text}')
@@ -382,31 +976,127 @@ class MongoDBBackup:
             logger.error(f'❌ Failed to send error email: {e}')
             return False
     
+    def _error_summary(self, error_msg: str) -> str:
+        """Upload a long error to GCS and return a short text body linking to it"""
+        summary = (f"Backup of {self.db_name} to {self.gcs_bucket} failed at {self.backup_iso}.\n\n"
+                   f"{error_msg[:_EMAIL_ERROR_INLINE_LIMIT]}\n...")
+        if self.bucket is None:
+            return summary
+        
+        filename = f'backups/errors/{self.backup_timestamp}.log'
+        try:
+            self.bucket.blob(filename).upload_from_string(error_msg, content_type='text/plain', checksum='crc32c')
+        except Exception as e:
+            logger.error('❌ Failed to upload %s to GCS: %s', filename, e)
+            return summary
+        return f"{summary}\n\nFull error: {_gcs_console_url(self.gcs_bucket, filename)}"
+    
+    def _notify(self, send, *args) -> None:
+        """Send a notification inline, or on the background pool when EMAIL_ASYNC is set"""
+        if self.async_email:
+            _NOTIFY_EXECUTOR.submit(send, *args)
+        else:
+            send(*args)
+    
     def cleanup_old_backups(self, days: int = 30) -> None:
         """Delete backups older than specified days"""
         try:
-            from datetime import timedelta
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             
-            bucket = self.gcs_client.bucket(self.gcs_bucket)
-            blobs = bucket.list_blobs(prefix='backups/')
+            bucket = self.bucket
+            to_delete = []
+            # Backups live under backups/<db>/<YYYY-MM-DD_HH-MM-SS>/ and metadata under
+            # backups/metadata/<YYYY-MM-DD>/, so folder names tell us which ones to list at all
+            for root in self._list_folders(bucket, 'backups/', cutoff_date, to_delete):
+                for folder in self._list_folders(bucket, root, cutoff_date, to_delete):
+                    folder_time = _folder_end_time(folder)
+                    if folder_time is None:
+                        to_delete.extend(self._list_expired(bucket, folder, cutoff_date))
+                    elif folder_time <= cutoff_date:
+                        to_delete.extend(bucket.list_blobs(prefix=folder, fields=_BLOB_LIST_FIELDS))
             
-            deleted_count = 0
-            for blob in blobs:
-                if blob.time_created and blob.time_created.replace(tzinfo=None) < cutoff_date:
-                    blob.delete()
-                    deleted_count += 1
+            # Each batch sends its deletes as a single multipart HTTP request, and the
+            # batches themselves run in parallel (the client's batch stack is thread-local)
+            chunks = [to_delete[start:start + _GCS_BATCH_LIMIT] for start in range(0, len(to_delete), _GCS_BATCH_LIMIT)]
+            if chunks:
+                with ThreadPoolExecutor(max_workers=min(8, len(chunks))) as executor:
+                    for future in as_completed([executor.submit(self._delete_batch, chunk) for chunk in chunks]):
+                        future.result()
+            deleted_count = len(to_delete)
             
             if deleted_count > 0:
                 logger.info(f'🗑️  Cleaned up {deleted_count} old backup files')
         except Exception as e:
             logger.error(f'❌ Failed to cleanup old backups: {e}')
     
+    def _list_folders(self, bucket, prefix: str, cutoff_date: datetime, expired: List[Any]) -> List[str]:
+        """List the sub-folders of a prefix, collecting expired blobs stored directly under it"""
+        iterator = bucket.list_blobs(prefix=prefix, delimiter='/', fields=f'{_BLOB_LIST_FIELDS},prefixes')
+        expired.extend(blob for blob in iterator if _is_expired(blob, cutoff_date))
+        return sorted(iterator.prefixes)
+    
+    def _list_expired(self, bucket, prefix: str, cutoff_date: datetime) -> List[Any]:
+        """Check every blob under a prefix whose name carries no date"""
+        blobs = bucket.list_blobs(prefix=prefix, fields=_BLOB_LIST_FIELDS)
+        return [blob for blob in blobs if _is_expired(blob, cutoff_date)]
+    
+    def _delete_batch(self, blobs: List[Any]) -> None:
+        """Delete up to _GCS_BATCH_LIMIT blobs in one batch request"""
+        with self.gcs_client.batch():
+            for blob in blobs:
+                blob.delete()
+    
+    def _backup_one(self, collection_name: str) -> bool:
+        """Export a single collection and record it in backup_info"""
+        logger.debug('Processing collection: %s', collection_name)
+        
+        if self.backup_mode == 'native':
+            filename = f'backups/{self.db_name}/{self.backup_timestamp}/{collection_name}.archive.gz'
+            stats = self.export_database_native(filename, collection_name)
+            if stats is not None:
+                # Display only: the archive is already uploaded, so a failed count must not fail the backup
+                stats['documents'] = self._estimated_count(collection_name)
+        else:
+            suffix = _COMPRESSION_FORMATS[self.compression][0]
+            filename = f'backups/{self.db_name}/{self.backup_timestamp}/{collection_name}.ndjson{suffix}'
+            if self.composite_threshold > 0 and self._estimated_size(collection_name) >= self.composite_threshold:
+                with self._composite_lock:
+                    stats = self.export_collection_composite(collection_name, filename)
+            else:
+                stats = self.export_collection_to_json(collection_name, filename)
+        if stats is None:
+            logger.error('❌ Failed to backup %s', collection_name)
+            return False
+        
+        with self._backup_info_lock:
+            self.backup_info.append({
+                'collection': collection_name,
+                'file': filename,
+                **stats
+            })
+        return True
+    
+    def _backup_native(self, collections: List[str]) -> bool:
+        """Dump the whole database with mongodump and record it in backup_info"""
+        filename = f'backups/{self.db_name}/{self.backup_timestamp}/{self.db_name}.archive.gz'
+        stats = self.export_database_native(filename)
+        if stats is None:
+            return False
+        
+        counts = [self._estimated_count(name) for name in collections]
+        self.backup_info.append({
+            'collection': '*',
+            'documents': None if None in counts else sum(counts),
+            'file': filename,
+            **stats
+        })
+        return True
+    
     def run_backup(self) -> bool:
         """Execute full backup process"""
         if not self.connect_mongo() or not self.connect_gcs():
             error_msg = "Failed to connect to MongoDB or GCS"
-            self.send_error_email(error_msg)
+            self._notify(self.send_error_email, error_msg)
             return False
         
         try:
@@ -414,48 +1104,49 @@ class MongoDBBackup:
             if not collections:
                 error_msg = "No collections to backup"
                 logger.warning(error_msg)
-                self.send_error_email(error_msg)
+                self._notify(self.send_error_email, error_msg)
                 return False
             
-            for collection_name in collections:
-                logger.info(f'Processing collection: {collection_name}')
-                
-                data = self.export_collection_to_json(collection_name)
-                if data:
-                    filename = f'backups/{self.db_name}/{self.backup_timestamp}/{collection_name}.json'
-                    if self.upload_to_gcs(filename, data):
-                        self.backup_info.append({
-                            'collection': collection_name,
-                            'documents': data['count'],
-                            'file': filename
-                        })
-                    else:
-                        logger.error(f'❌ Failed to backup {collection_name}')
-                        continue
-                else:
-                    logger.error(f'❌ Failed to export {collection_name}')
-                    continue
+            if self.backup_mode == 'native' and not self.collections:
+                self._backup_native(collections)
+            else:
+                # Collections are independent and I/O-bound, so export them concurrently
+                with ThreadPoolExecutor(max_workers=min(self.concurrency, len(collections))) as executor:
+                    futures = {executor.submit(self._backup_one, name): name for name in collections}
+                    for future in as_completed(futures):
+                        collection_name = futures[future]
+                        try:
+                            future.result()
+                        except Exception as e:
+                            logger.error(f'❌ Failed to backup {collection_name}: {e}')
+                # Exports finish in any order; report them in the order they were listed
+                position = {name: i for i, name in enumerate(collections)}
+                self.backup_info.sort(key=lambda item: position[item['collection']])
             
-            # Upload metadata
             if self.backup_info:
-                self.backup_metadata()
                 logger.info(f'✅ Backup completed: {len(self.backup_info)} collections backed up')
                 
-                # Send success email
-                self.send_success_email()
-                self.cleanup_old_backups()
+                # Metadata upload, email and cleanup are independent I/O, so none waits on the others
+                with ThreadPoolExecutor(max_workers=3) as executor:
+                    futures = [
+                        executor.submit(self.backup_metadata),
+                        executor.submit(self.cleanup_old_backups),
+                    ]
+                    if self.async_email:
+                        _NOTIFY_EXECUTOR.submit(self.send_success_email)
+                    else:
+                        futures.append(executor.submit(self.send_success_email))
+                    for future in futures:
+                        future.result()
                 return True
             else:
                 error_msg = "No collections were successfully backed up"
                 logger.warning(error_msg)
-                self.send_error_email(error_msg)
+                self._notify(self.send_error_email, error_msg)
                 return False
         
         except Exception as e:
             error_msg = f"Backup process failed: {str(e)}"
             logger.error(f'❌ {error_msg}')
-            self.send_error_email(error_msg)
+            self._notify(self.send_error_email, error_msg)
             return False
-        finally:
-            if self.mongo_client:
-                self.mongo_client.close()
@@ -0,0 +1,17 @@
+import os
+
+# Run with `gunicorn main:app`; gunicorn reads this file from the working directory
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# One worker keeps the shared MongoDB/GCS clients and Graph token cache in a single process;
+# threads let health checks and overlapping triggers be served while a backup runs
+workers = 1
+worker_class = 'gthread'
+threads = 8
+
+# Load main.py (Flask) once before forking so import errors fail at startup. backup.py is
+# imported lazily by the first trigger, so its log listener and pools start inside the worker.
+preload_app = True
+
+# Backups run inside the request, so allow far longer than the 30 s default
+timeout = 900
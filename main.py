@@ -3,12 +3,16 @@ import os
 import sys
 import logging
 from flask import Flask, jsonify
-from backup import MongoDBBackup
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@app.route('/health')
+def health():
+    """Liveness probe; registered first and never touches the backup module"""
+    return "ok", 200, {"Content-Type": "text/plain"}
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     return "MongoDB Backup Service - Healthy", 200
@@ -19,6 +23,8 @@ def trigger_backup():
     try:
         logger.info("🚀 Backup triggered")
         
+        # Imported on first trigger so cold starts and health checks skip the pymongo/GCS/zstd imports
+        from backup import MongoDBBackup
         backup = MongoDBBackup()
         success = backup.run_backup()
         